@@ -0,0 +1,122 @@
+'''
+The following code checks the behaviour of the database that is easy to break without noticing.
+Relies on "PokemonDataManager.py" and the "Pokemon Data.xlsx" document.
+
+Each check compares the database against the same result worked out directly from the data with pandas,
+and raises an AssertionError if they don't match. The checks are run with `python PokemonChecks.py` from the PokemonTeamBuilder folder.
+'''
+
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+import pandas as pd
+import PokemonDataManager as pdm
+
+
+# Returns the names of the elements in the rows returned by a search of the table.
+def rowNames(database, table, rows):
+    return set(database.queryData(table, rows).index)
+
+# Returns the power of every move as a number. Moves without a power (e.g., status moves, shown as "—") have no value.
+def movePower(database):
+    moves = database.moveData.data
+    return pd.to_numeric(moves['Power'].astype(object), errors='coerce')
+
+
+# Columns of numbers with placeholders for missing numbers are indexed as numbers, and any other column as text.
+def checkSortedIndex(database):
+    moves = database.moveData.data
+    assert pdm.SortedIndex(moves['Power']).numeric
+    assert not pdm.SortedIndex(moves['Type']).numeric
+    assert pdm.SortedIndex(pd.Series([10, "—", 30, "-"])).numeric
+    assert not pdm.SortedIndex(pd.Series([10, "Varies", 30])).numeric
+
+    # Rows with a placeholder are left out of a numeric index, while every row is kept in a text index.
+    power = movePower(database)
+    assert len(pdm.SortedIndex(moves['Power']).present) == power.notna().sum()
+    assert len(pdm.SortedIndex(moves['Type']).present) == len(moves)
+    return None
+
+# Moves without a power never match a comparison of the power, even when it is negated.
+def checkNegation(database):
+    moves = database.moveData.data
+    power = movePower(database)
+    assert rowNames(database, "moves", database.where("moves", ["not", [">=", "Power", 90]])) == set(moves.index[power < 90])
+    assert rowNames(database, "moves", database.where("moves", ["!=", "Power", 90])) == set(moves.index[power.notna() & (power != 90)])
+
+    # Negating a text comparison matches every row that doesn't match it.
+    assert rowNames(database, "moves", database.where("moves", ["not", ["==", "Type", "fire"]])) == set(moves.index[moves['Type'] != "Fire"])
+    return None
+
+# Between includes both of its bounds.
+def checkBetween(database):
+    moves = database.moveData.data
+    power = movePower(database)
+    assert rowNames(database, "moves", database.where("moves", ["between", "Power", 60, 80])) == set(moves.index[(power >= 60) & (power <= 80)])
+    assert rowNames(database, "moves", database.where("moves", ["between", "Power", 80, 60])) == set()
+    return None
+
+# In takes a list of values, and any other value is an error rather than a search that matches nothing.
+def checkInPredicate(database):
+    moves = database.moveData.data
+    assert rowNames(database, "moves", database.where("moves", ["in", "Type", ["Fire", "water"]])) == set(moves.index[moves['Type'].isin(["Fire", "Water"])])
+    try:
+        database.where("moves", ["in", "Type", "Fire"])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("An in predicate with a single value should raise a ValueError.")
+    return None
+
+# Changing one sheet of the excel document only reloads that sheet. The data of the other sheets is kept as it was,
+# and the new data replaces the old data as a single new generation.
+def checkReload(database):
+    with tempfile.TemporaryDirectory() as folder:
+        excelName = os.path.join(folder, "Pokemon Data.xlsx")
+        shutil.copy(database.excelName, excelName)
+        copied = pdm.PokemonDatabase(excelName)
+        previous = copied.generation
+        assert copied.reload() == []
+        assert copied.generation is previous
+
+        # Change the power of the first move (shown in cell D2 of the moves sheet) directly in the sheet's file inside the document.
+        power = int(movePower(copied).iloc[0])
+        cell = re.compile(rb'(<c r="D2"[^>]*><v>)([0-9.]+)(</v>)')
+        changedName = os.path.join(folder, "Changed.xlsx")
+        changedSheets = 0
+        with zipfile.ZipFile(excelName) as workbook, zipfile.ZipFile(changedName, "w", zipfile.ZIP_DEFLATED) as changed:
+            for item in workbook.infolist():
+                contents = workbook.read(item)
+                # Only the moves sheet should have the first move's power in cell D2.
+                if item.filename.startswith("xl/worksheets/sheet"):
+                    match = cell.search(contents)
+                    if match and (float(match.group(2)) == power):
+                        contents = cell.sub(lambda found: found.group(1) + str(power + 1).encode() + found.group(3), contents, count=1)
+                        changedSheets += 1
+                changed.writestr(item, contents)
+        os.replace(changedName, excelName)
+        assert changedSheets == 1
+
+        assert copied.reload() == ["Moves"]
+        assert copied.version == previous.version + 1
+        assert int(movePower(copied).iloc[0]) == power + 1
+        for name in ("pokemonData", "abilityList", "natureList", "itemData"):
+            assert getattr(copied.generation, name) is getattr(previous, name)
+        assert copied.queryEngine is not previous.queryEngine
+        assert copied.reload() == []
+    return None
+
+
+def main():
+    pdb = pdm.PokemonDatabase('Pokemon Data.xlsx')
+    checks = [checkSortedIndex, checkNegation, checkBetween, checkInPredicate, checkReload]
+    for check in checks:
+        check(pdb)
+        print(f"{check.__name__}: passed")
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -4,21 +4,108 @@ The following is for the purpose of building and editing a team of Pokemon using
 Dataframes will be manipulated by a user using a GUI in a different file.
 '''
 import os
+import copy
+import functools
+import hashlib
+import posixpath
+import re
+import threading
+import weakref
+import zipfile
+import xml.etree.ElementTree as ET
 import numpy as np
 import pandas as pd
 import math
 import matplotlib.pyplot as plt
 
 
+# Returns the memory used by a dataframe in bytes, including the contents of text columns.
+def memoryUsage(data):
+    return int(data.memory_usage(deep=True).sum())
+
+# Converts the columns of a dataframe into more memory efficient types.
+# Integer columns are narrowed to the smallest integer type that can hold their values and
+# text columns with few distinct values (e.g., types, categories, natures) are stored as categories.
+def compactData(data):
+    data = data.copy()
+    for column in data.columns:
+        if pd.api.types.is_integer_dtype(data[column]):
+            # Stats are never negative, so they can be stored without a sign to fit them in a single byte.
+            data[column] = pd.to_numeric(data[column], downcast='unsigned' if data[column].min() >= 0 else 'integer')
+        elif (data[column].dtype == object) and (len(set(data[column])) <= len(data) / 2):
+            data[column] = data[column].astype('category')
+    return data
+
+# Makes an array of row numbers read only so that cached results can be shared without being changed.
+def readOnly(rows):
+    rows.setflags(write=False)
+    return rows
+
+# Normalizes a search value so that equivalent searches share the same cached result.
+# Empty values mean that the filter shouldn't be applied.
+def normalizeFilter(value):
+    if value is None:
+        return None
+    value = str(value).strip().casefold()
+    if value == "":
+        return None
+    return value
+
+# Returns a hash of the contents of each sheet in an excel workbook, in the order of the sheets.
+# The sheets are hashed from the files inside the workbook without reading any of their cells into dataframes.
+# Text in a sheet is stored in a list of strings shared by every sheet, so only the strings a sheet refers to are included in its hash.
+def sheetHashes(excelName):
+    namespaces = {"main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+                  "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+                  "rel": "http://schemas.openxmlformats.org/package/2006/relationships"}
+    with zipfile.ZipFile(excelName) as workbook:
+        # Find the file holding each sheet, in the order that the sheets appear in the workbook.
+        relationships = ET.fromstring(workbook.read("xl/_rels/workbook.xml.rels"))
+        targets = {relationship.get("Id"): relationship.get("Target") for relationship in relationships.findall("rel:Relationship", namespaces)}
+        sheets = ET.fromstring(workbook.read("xl/workbook.xml")).findall("main:sheets/main:sheet", namespaces)
+        paths = []
+        for sheet in sheets:
+            # Targets are either relative to the "xl" folder or start with "/" if they are relative to the whole workbook.
+            target = targets[sheet.get("{%s}id" % namespaces["r"])]
+            paths.append(target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target)))
+
+        sharedStrings = []
+        if "xl/sharedStrings.xml" in workbook.namelist():
+            sharedStrings = re.findall(rb"<si>(.*?)</si>|<si/>", workbook.read("xl/sharedStrings.xml"), re.DOTALL)
+
+        hashes = []
+        for path in paths:
+            sheet = workbook.read(path)
+            sheetHash = hashlib.sha1(sheet)
+            for index in re.findall(rb'<c [^>]*t="s"[^>]*>\s*<v>(\d+)</v>', sheet):
+                sheetHash.update(sharedStrings[int(index)] + b"\0")
+            hashes.append(sheetHash.hexdigest())
+    return hashes
+
+# Converts a predicate made of lists into one made of tuples so that it can be used as a cache key.
+def freezePredicate(predicate):
+    if isinstance(predicate, (list, tuple)):
+        return tuple(freezePredicate(part) for part in predicate)
+    return predicate
+
+
 # Parent class to hold the dataframe for different data type (e.g., Pokemon, Moves, Items) and filter methods.
 class Data:
     def __init__(self, data):
         self.data = data
         self.data = self.data.fillna("-")
+
+        # Record the memory used by the data as it was read in before compacting it.
+        self.rawMemory = memoryUsage(self.data)
+        self.data = compactData(self.data)
+
         self.filtered = self.data
         self.filters = {}
         self.nameFilter = ""
 
+        # Name filters are matched as regular expressions unless this is turned off.
+        self.regexName = True
+
     # Returns the data for the requested element if it is in the database
     def elementInfo(self,name):
         return self.data[self.data.index == name]
@@ -26,7 +113,8 @@ class Data:
     # Filters the data based on specified filter data.
     def filterData(self):
         # Filtered data is reset so that updated filters won't rely on the old data.
-        self.filtered = self.data.copy()
+        # Filtering always creates a new dataframe, so the original data doesn't need to be copied.
+        self.filtered = self.data
 
         # Filters the data based on what filters have been added. This is performed on the original dataset. 
         for filter_name, filter_value in self.filters.items():
@@ -39,7 +127,7 @@ class Data:
     def filterName(self):
         # Filters the data based on if the names contain the string that they are being filtered against.
         if (self.nameFilter != "") & (not self.filtered.empty):
-            self.filtered = self.filtered[self.filtered.index.str.contains(self.nameFilter, case=False)]
+            self.filtered = self.filtered[self.filtered.index.str.contains(self.nameFilter, case=False, regex=self.regexName)]
         return None
 
     # Places an empty filter value into the filter name if no filter value was given.
@@ -48,6 +136,10 @@ class Data:
             return ""
         return filter_value
 
+    # Returns whether the data can be filtered by the filter name. Any column can be filtered, as well as the names of the elements.
+    def isFilterName(self, filter_name):
+        return (filter_name == "Name") or (filter_name in self.data.columns)
+
     # Adds a new filter to be applied to the data. Each filter value and its corresponding column are stored in a dictionary.
     def addFilter(self, filter_name, filter_value):
         # Name filter is separate from other filters and is thus not to be placed in the dictionary.
@@ -67,20 +159,39 @@ class Data:
 
     def filterReset(self):
         self.filters = {}
-        self.filtered = self.data.copy()
+        self.filtered = self.data
         return self.filtered
 
+    # Returns a copy of the filter state that shares the same data.
+    # This allows separate users to filter the data without affecting each other or copying the data.
+    # Name filters of a copy are matched as plain text, since they may come from users of the server.
+    def filterSession(self):
+        session = copy.copy(self)
+        session.filters = {}
+        session.nameFilter = ""
+        session.regexName = False
+        session.filtered = session.data
+        return session
+
 # Class to hold the dataframe for every Pokemon species as well as the filter methods.
 class PokemonData(Data):
     def __init__(self, data):
         super().__init__(data)
-        self.data['Abilities'] =  data['Abilities'].str.split(',') #Make abilities into an array
-        self.filtered = self.data.copy()
+
+        # Abilities are kept as categories of the comma separated text since many species share the same abilities.
+        # Each distinct set of abilities is split into a list only once.
+        self.data['Abilities'] = self.data['Abilities'].astype('category')
+        self.abilitySets = {abilities: abilities.split(',') for abilities in self.data['Abilities'].cat.categories}
+        self.filtered = self.data
 
         #Ability filters start as empty. "" indicates that the filter shouldn't be implemented
         self.typeFilter = ""
         self.abilityFilter = ""
     
+    # Returns the list of abilities stored in the Abilities value of a Pokemon.
+    def splitAbilities(self, abilities):
+        return self.abilitySets.get(abilities, [])
+
     # Finds the Pokemon with with the Pokemon matching index number
     def index(self, pokedexNumber):
         return self.data[self.data['National Pokedex No'] == pokedexNumber]
@@ -97,11 +208,15 @@ class PokemonData(Data):
     # Filters the Pokemon based on the desired ability. 
     def filterAbility(self):
         if (self.abilityFilter != "") & (not self.filtered.empty):
-            # Checks the entire array of abilities available to a Pokemon.
-            self.filtered = self.filtered[
-                [(self.abilityFilter in x) for x in self.filtered['Abilities']]]
+            # Checks the entire array of abilities available to a Pokemon. Only the distinct sets of abilities need to be checked.
+            matching = [abilities for abilities, split in self.abilitySets.items() if self.abilityFilter in split]
+            self.filtered = self.filtered[self.filtered['Abilities'].isin(matching)]
         return None
 
+    # The Pokemon can only be filtered by name, type, and ability.
+    def isFilterName(self, filter_name):
+        return filter_name in ("Name", "Type", "Ability")
+
     # Adds the filters to be applied to the data.
     def addFilter(self, filter_name, filter_value):
         if filter_name == "Name":
@@ -116,7 +231,7 @@ class PokemonData(Data):
     # Due to how unique the filters for this dataset is, specifically, a separate method was created from the standard data.
     # Performs all the necessary filter methods
     def quickFilter(self, filter_name, filter_value):
-        self.filtered = self.data.copy()
+        self.filtered = self.data
         self.addFilter(filter_name, filter_value)
         self.filterType()
         self.filterAbility()
@@ -128,6 +243,13 @@ class PokemonData(Data):
         self.filtered = self.filtered.sort_values(by = [sortBy, "Pokemon"])
         return self.filtered
     
+    # Returns a copy of the filter state that shares the same data. The type and ability filters are also separate for each copy.
+    def filterSession(self):
+        session = super().filterSession()
+        session.typeFilter = ""
+        session.abilityFilter = ""
+        return session
+
     def filterReset(self):
         self.typeFilter = ""
         self.abilityFilter = ""
@@ -136,26 +258,480 @@ class PokemonData(Data):
         self.filtered = self.data
         return self.filtered
 
+# Class to hold the relationships between every Pokemon form and its base species.
+# Each alternate form is mapped to its base species and the item or move that is required to maintain it.
+class FormGraph:
+    def __init__(self, pokemonData, itemData, moveData):
+        self.baseForms = {}
+        self.formRequirements = {}
+        self.requirementTypes = {}
+        self.reachableForms = {}
+
+        # Sets of the names are used for membership checks so the dataframe indexes don't need to build lookup tables.
+        species, items, moves = set(pokemonData.index), set(itemData.index), set(moveData.index)
+
+        # Only Pokemon with a form value other than 0 are alternate forms.
+        forms = pokemonData[pokemonData['Form'] != 0]
+        for name, form in zip(forms.index, forms['Form']):
+            # The base species is the name of the Pokemon with the form suffix (e.g., " - Mega X", " - Origin") removed.
+            baseForm = name.rsplit(" - ", 1)[0]
+            if baseForm not in species:
+                continue
+            self.baseForms[name] = baseForm
+            self.formRequirements[name] = form
+            self.reachableForms.setdefault(baseForm, []).append(name)
+
+            # Indicate if the form is triggered by holding an item or by knowing a move.
+            if form in items:
+                self.requirementTypes[form] = "Item"
+            elif form in moves:
+                self.requirementTypes[form] = "Move"
+
+    # Returns the base species of the requested Pokemon. Pokemon that aren't alternate forms are their own base species.
+    def baseForm(self, name):
+        return self.baseForms.get(name, name)
+
+    # Returns the item or move required for the requested form, or 0 if nothing is required.
+    def formRequirement(self, name):
+        return self.formRequirements.get(name, 0)
+
+    # Returns whether the requirement is an "Item" or a "Move", or None if it isn't a form requirement.
+    def requirementType(self, requirement):
+        return self.requirementTypes.get(requirement)
+
+    # Returns every alternate form that can be reached from the requested base species.
+    def formsOf(self, name):
+        return list(self.reachableForms.get(self.baseForm(name), []))
+
+
+# Class to hold a single column of a table sorted by value so that comparisons can be found with a binary search.
+# Columns where every value is a number, or a placeholder for a missing number (e.g., "—" for the power of status moves), are sorted as numbers.
+# Rows with missing numbers are left out of the index, so they never match a comparison, even a negated one. Any other column is sorted as case-folded text.
+class SortedIndex:
+    placeholders = {"-", "—"}
+
+    def __init__(self, column):
+        values = column.astype(object).to_numpy()
+        numbers = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+        missing = np.isnan(numbers)
+        self.numeric = all((value in self.placeholders) for value in values[missing])
+        if self.numeric:
+            values = numbers
+            rows = np.flatnonzero(~missing)
+        else:
+            values = np.array([str(value).casefold() for value in values], dtype=object)
+            rows = np.arange(len(values))
+
+        # The rows that have a value, in order, which are the only rows a comparison of the column can match.
+        self.present = readOnly(rows)
+        order = np.argsort(values[rows], kind='stable')
+        self.rows = rows[order]
+        self.values = values[self.rows]
+        self.length = len(column)
+
+    # Converts a value being searched for into the same form as the values in the index.
+    def key(self, value):
+        if self.numeric:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{value} can't be compared to a column of numbers.")
+        return str(value).casefold()
+
+    # Returns the row numbers with values between low and high. Either bound can be left as None to leave that side open.
+    def range(self, low=None, high=None, includeLow=True, includeHigh=True):
+        start = 0 if low is None else np.searchsorted(self.values, self.key(low), side='left' if includeLow else 'right')
+        end = len(self.values) if high is None else np.searchsorted(self.values, self.key(high), side='right' if includeHigh else 'left')
+        return np.sort(self.rows[start:end])
+
+    # Returns the row numbers with a value equal to any of the given values.
+    def isin(self, values):
+        matching = [self.range(value, value) for value in values]
+        return np.unique(np.concatenate(matching)) if matching else np.array([], dtype=np.intp)
+
+
+# Class to search the Pokemon, move, and item data without changing any filter state.
+# Each search returns the row numbers of the matching elements rather than a dataframe, and recent results are kept in bounded caches.
+# The result of each individual filter is cached separately, so searches that share filters reuse each other's work.
+class QueryEngine:
+    # The filters that can be applied to each table.
+    tableFilters = {"pokemon": ("name", "type", "ability"),
+                    "moves": ("name", "type", "category"),
+                    "items": ("name",)}
+
+    def __init__(self, pokemonData, moveData, itemData, cacheSize=1024):
+        # The tables are kept as they were loaded so that row numbers don't change if the data is sorted later.
+        self.tables = {"pokemon": pokemonData.data, "moves": moveData.data, "items": itemData.data}
+        self.abilitySets = pokemonData.abilitySets
+
+        self.cachedQuery = functools.lru_cache(maxsize=cacheSize)(self.runQuery)
+        self.cachedFilter = functools.lru_cache(maxsize=cacheSize)(self.filterRows)
+        self.cachedOrder = functools.lru_cache(maxsize=None)(self.sortOrder)
+        self.cachedWhere = functools.lru_cache(maxsize=cacheSize)(self.runWhere)
+        self.cachedIndex = functools.lru_cache(maxsize=None)(self.columnIndex)
+
+    # Returns the row numbers of every element in the table that matches all of the given filters.
+    # If a column to sort by is given, the rows are ordered by that column and then by name.
+    def query(self, table, name=None, type=None, ability=None, category=None, sort=None):
+        if table not in self.tables:
+            raise ValueError(f"Unknown table {table}.")
+
+        # Build the cache key from only the filters that are being applied, in a fixed order.
+        filters = []
+        for filter_name, filter_value in (("name", name), ("type", type), ("ability", ability), ("category", category)):
+            filter_value = normalizeFilter(filter_value)
+            if filter_value is None:
+                continue
+            if filter_name not in self.tableFilters[table]:
+                raise ValueError(f"The {table} table can't be filtered by {filter_name}.")
+            filters.append((filter_name, filter_value))
+
+        if (sort is not None) and (sort not in self.tables[table].columns):
+            raise ValueError(f"The {table} table has no column {sort}.")
+        return self.cachedQuery(table, tuple(filters), sort)
+
+    # Performs a search that wasn't found in the cache by combining the results of each filter.
+    def runQuery(self, table, filters, sort):
+        rows = None
+        for filter_name, filter_value in filters:
+            matching = self.cachedFilter(table, filter_name, filter_value)
+            rows = matching if rows is None else np.intersect1d(rows, matching, assume_unique=True)
+        if rows is None:
+            rows = np.arange(len(self.tables[table]))
+        if sort is not None:
+            rows = rows[np.argsort(self.cachedOrder(table, sort)[rows], kind='stable')]
+        return readOnly(rows)
+
+    # Returns the row numbers of the elements in the table that match a single filter.
+    # Type, category, and ability filters only need to check the distinct values of a column rather than every row.
+    def filterRows(self, table, filter_name, filter_value):
+        data = self.tables[table]
+        if filter_name == "name":
+            mask = data.index.str.contains(filter_value, case=False, regex=False)
+        elif filter_name == "ability":
+            matching = [abilities for abilities, split in self.abilitySets.items()
+                        if filter_value in [ability.strip().casefold() for ability in split]]
+            mask = data['Abilities'].isin(matching)
+        else:
+            # Pokemon have two type columns while moves only have one.
+            columns = ['Type 1', 'Type 2'] if (table == "pokemon") else [filter_name.capitalize()]
+            mask = np.zeros(len(data), dtype=bool)
+            for column in columns:
+                categories = [value for value in data[column].cat.categories if normalizeFilter(value) == filter_value]
+                mask |= data[column].isin(categories).to_numpy()
+        return readOnly(np.flatnonzero(mask))
+
+    # Returns the row numbers of every element in the table that matches a predicate.
+    # A predicate is a list starting with an operator:
+    #   [">=", column, value], and likewise for ">", "<", "<=", "==", and "!="
+    #   ["between", column, low, high]     low <= value <= high
+    #   ["in", column, [value, ...]]       value is any of the listed values
+    #   ["contains", column, text]         value contains the text, ignoring case
+    #   ["not", predicate], ["and", predicate, ...], ["or", predicate, ...]
+    # Rows missing a number (e.g., the power of status moves) never match a comparison of that column. A not predicate
+    # and "!=" only match rows that have a number in every column of numbers they compare.
+    # The column "Name" refers to the names of the elements. Comparisons use sorted indexes of each column,
+    # which are built the first time a column is searched. Text comparisons ignore case.
+    def where(self, table, predicate, sort=None):
+        if table not in self.tables:
+            raise ValueError(f"Unknown table {table}.")
+        if (sort is not None) and (sort not in self.tables[table].columns):
+            raise ValueError(f"The {table} table has no column {sort}.")
+        return self.cachedWhere(table, freezePredicate(predicate), sort)
+
+    # Performs a predicate search that wasn't found in the cache.
+    def runWhere(self, table, predicate, sort):
+        rows = self.predicateRows(table, predicate)
+        if sort is not None:
+            rows = rows[np.argsort(self.cachedOrder(table, sort)[rows], kind='stable')]
+        return readOnly(rows)
+
+    # Returns the sorted row numbers matching a predicate by combining the results of each part of it.
+    def predicateRows(self, table, predicate):
+        if (not isinstance(predicate, tuple)) or (not predicate):
+            raise ValueError(f"Invalid predicate {predicate}.")
+        operator, arguments = predicate[0], predicate[1:]
+        length = len(self.tables[table])
+
+        if operator == "and":
+            rows = np.arange(length)
+            for part in arguments:
+                rows = np.intersect1d(rows, self.predicateRows(table, part), assume_unique=True)
+            return rows
+        if operator == "or":
+            rows = np.array([], dtype=np.intp)
+            for part in arguments:
+                rows = np.union1d(rows, self.predicateRows(table, part))
+            return rows
+        if operator == "not":
+            if len(arguments) != 1:
+                raise ValueError("A not predicate takes a single predicate.")
+            rows = self.predicateRows(table, arguments[0])
+            return np.setdiff1d(self.comparableRows(table, arguments[0]), rows, assume_unique=True)
+
+        if len(arguments) < 2:
+            raise ValueError(f"Invalid predicate {predicate}.")
+        column, values = arguments[0], arguments[1:]
+        if operator == "contains":
+            data = self.tables[table]
+            names = data.index if column == "Name" else data[self.checkColumn(table, column)]
+            return np.flatnonzero(names.astype(str).str.contains(str(values[0]), case=False, regex=False))
+
+        index = self.cachedIndex(table, column)
+        if operator == "==":
+            return index.range(values[0], values[0])
+        if operator == "!=":
+            return np.setdiff1d(index.present, index.range(values[0], values[0]), assume_unique=True)
+        if operator == ">=":
+            return index.range(low=values[0])
+        if operator == ">":
+            return index.range(low=values[0], includeLow=False)
+        if operator == "<=":
+            return index.range(high=values[0])
+        if operator == "<":
+            return index.range(high=values[0], includeHigh=False)
+        if operator == "between":
+            if len(values) != 2:
+                raise ValueError("A between predicate takes a low and a high value.")
+            return index.range(values[0], values[1])
+        if operator == "in":
+            if not isinstance(values[0], tuple):
+                raise ValueError("An in predicate takes a list of values.")
+            return index.isin(values[0])
+        raise ValueError(f"Unknown operator {operator}.")
+
+    # Returns the rows that have a value in every column compared by a predicate, which are the rows that negating it can match.
+    # The predicate is assumed to be valid, since its rows have already been found.
+    def comparableRows(self, table, predicate):
+        operator, arguments = predicate[0], predicate[1:]
+        if operator in ("and", "or", "not"):
+            rows = np.arange(len(self.tables[table]))
+            for part in arguments:
+                rows = np.intersect1d(rows, self.comparableRows(table, part), assume_unique=True)
+            return rows
+        if operator == "contains":
+            return np.arange(len(self.tables[table]))
+        return self.cachedIndex(table, arguments[0]).present
+
+    # Makes sure that the column is in the table.
+    def checkColumn(self, table, column):
+        if column not in self.tables[table].columns:
+            raise ValueError(f"The {table} table has no column {column}.")
+        return column
+
+    # Builds the sorted index for a column of a table. "Name" builds an index of the names of the elements.
+    def columnIndex(self, table, column):
+        data = self.tables[table]
+        if column == "Name":
+            return SortedIndex(data.index.to_series())
+        return SortedIndex(data[self.checkColumn(table, column)])
+
+    # Returns the position of every row in the table when it is sorted by the column and then by name.
+    def sortOrder(self, table, column):
+        data = self.tables[table].reset_index()
+        order = data.sort_values(by = [column, data.columns[0]], kind='stable').index.to_numpy()
+        ranks = np.empty(len(order), dtype=np.intp)
+        ranks[order] = np.arange(len(order))
+        return readOnly(ranks)
+
+    # Returns the data for the rows returned by a search of the table.
+    def rowData(self, table, rows):
+        return self.tables[table].iloc[rows]
+
+    # Returns the hits, misses, and sizes of the search cache and the individual filter cache.
+    def cacheInfo(self):
+        return {"queries": self.cachedQuery.cache_info()._asdict(), "filters": self.cachedFilter.cache_info()._asdict(),
+                "predicates": self.cachedWhere.cache_info()._asdict()}
+
+
+# Class to hold one version of the data read in from the excel document, along with the form graph, query engine, and team index built from it.
+# A reload builds a new generation and replaces the database's generation with it in a single step, so anything that reads
+# the generation once sees data that all belongs together, even if the database is reloaded while it is being used.
+class DataGeneration:
+    def __init__(self, version, hashes, loaded, previous=None):
+        # Sheets that weren't reloaded are shared with the previous generation.
+        if previous is not None:
+            vars(self).update(vars(previous))
+        vars(self).update(loaded)
+        self.version = version
+        self.hashes = hashes
+
+
 # Class to hold every Pokemon dataframe in a single database.
 class PokemonDatabase:
+    # The name of each sheet in the excel document, in order.
+    sheetNames = ["Pokemon", "Abilities", "Moves", "Natures", "Items"]
+
     def __init__(self, excelName):
+        self.excelName = excelName
+
+        # Every Pokemon and team made with the database is tracked so that they can be refreshed when the data is reloaded.
+        # They can be made by several threads at once, so the sets are only changed or copied while holding the lock.
+        self.pokemon = weakref.WeakSet()
+        self.teams = weakref.WeakSet()
+        self.trackLock = threading.Lock()
+
+        self.reloadLock = threading.Lock()
+        self.watcher = None
+        self.stopWatching = threading.Event()
+
         # Reads in each sheet to store as data for each Pokemon species and lists of every move, ability, and item
-        self.pokemonData = PokemonData(pd.read_excel(excelName, sheet_name=0, index_col=1))
-        self.abilityList = pd.read_excel(excelName, sheet_name=1, index_col=0)
-        self.moveData = Data(pd.read_excel(excelName, sheet_name=2, index_col=0))
-        self.natureList = pd.read_excel(excelName, sheet_name=3, index_col=0)
-        self.itemData = Data(pd.read_excel(excelName, sheet_name=4, index_col=0))
-        
-        self.abilityList = self.abilityList.fillna("-")
-        self.natureList = self.natureList.fillna("-")
+        # The data starts at version 0, which increases every time the data is reloaded.
+        self.modified = os.path.getmtime(excelName)
+        self.generation = DataGeneration(0, sheetHashes(excelName), self.loadSheets(range(len(self.sheetNames))))
+
+    # The data of the current generation can be read as attributes of the database (e.g., database.pokemonData).
+    # Anything that reads more than one of them for a single operation should read the generation once instead,
+    # so that a reload between the reads can't mix data from two generations.
+    def __getattr__(self, name):
+        if name == "generation":
+            raise AttributeError(name)
+        return getattr(self.generation, name)
+
+    # Reads in the requested sheets and builds everything that depends on them.
+    # Sheets that aren't read in are taken from the previous generation when rebuilding the form graph, query engine, and team index.
+    # Returns the new attributes of the generation rather than setting them, so that they can all be replaced at once.
+    def loadSheets(self, sheets, previous=None):
+        loaded = {}
+        with pd.ExcelFile(self.excelName) as workbook:
+            if 0 in sheets:
+                loaded['pokemonData'] = PokemonData(workbook.parse(0, index_col=1))
+            if 1 in sheets:
+                abilityList = workbook.parse(1, index_col=0).fillna("-")
+                # Record the memory used by the list as it was read in before compacting it.
+                loaded['abilityMemory'] = memoryUsage(abilityList)
+                loaded['abilityList'] = compactData(abilityList)
+            if 2 in sheets:
+                loaded['moveData'] = Data(workbook.parse(2, index_col=0))
+            if 3 in sheets:
+                natureList = workbook.parse(3, index_col=0).fillna("-")
+                loaded['natureMemory'] = memoryUsage(natureList)
+                loaded['natureList'] = compactData(natureList)
+            if 4 in sheets:
+                loaded['itemData'] = Data(workbook.parse(4, index_col=0))
+
+        # The form graph, query engine, and team index only need to be rebuilt if the species, moves, or items changed.
+        if {0, 2, 4} & set(sheets):
+            pokemonData = loaded.get('pokemonData', getattr(previous, 'pokemonData', None))
+            moveData = loaded.get('moveData', getattr(previous, 'moveData', None))
+            itemData = loaded.get('itemData', getattr(previous, 'itemData', None))
+
+            # Build the table of alternate forms once so form checks don't need to search the data again.
+            loaded['formGraph'] = FormGraph(pokemonData.data, itemData.data, moveData.data)
+
+            # Searches that don't change the filter state of the data are performed and cached by the query engine.
+            loaded['queryEngine'] = QueryEngine(pokemonData, moveData, itemData)
+
+            # Index of the saved teams used to find teams similar to another. It is only read in when it is first used.
+            loaded['teamIndex'] = TeamIndex(pokemonData, moveData, itemData)
+        return loaded
+
+    # Reloads the sheets of the excel document whose contents have changed since they were last read in.
+    # The new data replaces the old data all at once as a new generation, after which every Pokemon and team made with the database is refreshed.
+    # Returns the names of the sheets that were reloaded.
+    def reload(self):
+        with self.reloadLock:
+            modified = os.path.getmtime(self.excelName)
+            hashes = sheetHashes(self.excelName)
+            previous = self.generation
+            changed = [i for i, sheetHash in enumerate(hashes) if (i >= len(previous.hashes)) or (sheetHash != previous.hashes[i])]
+            if changed:
+                self.generation = DataGeneration(previous.version + 1, hashes, self.loadSheets(changed, previous), previous)
+            self.modified = modified
+        if changed:
+            self.refresh()
+        return [self.sheetNames[i] for i in changed]
+
+    # Adds a Pokemon or a team to the ones refreshed when the data is reloaded.
+    def trackPokemon(self, pokemon):
+        with self.trackLock:
+            self.pokemon.add(pokemon)
+        return None
+
+    def trackTeam(self, team):
+        with self.trackLock:
+            self.teams.add(team)
+        return None
+
+    # Refreshes every team and Pokemon made with the database against the current data.
+    def refresh(self):
+        with self.trackLock:
+            teams = list(self.teams)
+            tracked = list(self.pokemon)
+        members = {id(member) for team in teams for member in team.team}
+        for team in teams:
+            team.refresh()
+        for pokemon in tracked:
+            if id(pokemon) not in members:
+                pokemon.refresh()
+        return None
+
+    # Starts checking the excel document for changes in the background every interval seconds, reloading it when it changes.
+    def watch(self, interval=2.0):
+        if (self.watcher is not None) and self.watcher.is_alive():
+            return None
+        self.stopWatching.clear()
+        self.watcher = threading.Thread(target=self.watchLoop, args=(interval,), daemon=True)
+        self.watcher.start()
+        return None
+
+    def unwatch(self):
+        self.stopWatching.set()
+        if self.watcher is not None:
+            self.watcher.join()
+        self.watcher = None
+        return None
+
+    def watchLoop(self, interval):
+        failed = None
+        while not self.stopWatching.wait(interval):
+            modified = None
+            try:
+                modified = os.path.getmtime(self.excelName)
+                if (modified != self.modified) and (modified != failed):
+                    self.reload()
+            # The document may be missing, only partly written, or malformed while it is being saved, so it is checked again once it changes.
+            # Any error is reported rather than raised so that a single bad save doesn't stop the data from being reloaded again.
+            except Exception as error:
+                failed = modified
+                print(f"The Pokemon data could not be reloaded: {type(error).__name__}: {error}")
+        return None
 
     # Returns the data for the requested ability if it is in the database
     def abilityDescription(self,name):
-        return self.abilityList[self.abilityList.index == name]
+        abilityList = self.generation.abilityList
+        return abilityList[abilityList.index == name]
     
     # Returns the data for the requested nature if it is in the database
     def natureDescription(self,name):
-        return self.natureList[self.natureList.index == name]
+        natureList = self.generation.natureList
+        return natureList[natureList.index == name]
+
+    # Returns the row numbers of the elements in a table ("pokemon", "moves", or "items") matching the given filters.
+    def query(self, table, name=None, type=None, ability=None, category=None, sort=None):
+        return self.queryEngine.query(table, name, type, ability, category, sort)
+
+    # Returns the row numbers of the elements in a table matching a predicate of ranges, lists, and combinations of them.
+    # See QueryEngine.where for how predicates are written.
+    def where(self, table, predicate, sort=None):
+        return self.queryEngine.where(table, predicate, sort)
+
+    # Returns the data for the rows returned by a query. The rows must come from the current generation's query engine.
+    def queryData(self, table, rows):
+        return self.queryEngine.rowData(table, rows)
+
+    # Returns the memory used by each sheet of the database before and after it was compacted, in bytes.
+    def memoryReport(self):
+        generation = self.generation
+        sheets = {"Pokemon": (generation.pokemonData.rawMemory, memoryUsage(generation.pokemonData.data)),
+                  "Abilities": (generation.abilityMemory, memoryUsage(generation.abilityList)),
+                  "Moves": (generation.moveData.rawMemory, memoryUsage(generation.moveData.data)),
+                  "Natures": (generation.natureMemory, memoryUsage(generation.natureList)),
+                  "Items": (generation.itemData.rawMemory, memoryUsage(generation.itemData.data))}
+        report = pd.DataFrame.from_dict(sheets, orient='index', columns=['Before', 'After'])
+        report.loc['Total'] = report.sum()
+        report['Reduction'] = 1 - report['After'] / report['Before']
+        return report
 
 
 # Class to handle individual Pokemon methods
@@ -163,6 +739,7 @@ class PokemonDatabase:
 class Pokemon:
     def __init__(self, name, database):
         self.database = database
+        database.trackPokemon(self)
         
         # Initialize the elements of the Pokemon
         columns=['National Pokedex No','Type 1','Type 2','Nature',
@@ -185,7 +762,9 @@ class Pokemon:
         
     # Changes the specie of the Pokemon without fundamentally altering other aspects.
     def changeSpecies(self, name):
-        pokemonStats = self.database.pokemonData.elementInfo(name)
+        # Everything is read from a single generation of the data so that a reload part way through can't mix old and new data.
+        generation = self.database.generation
+        pokemonStats = generation.pokemonData.elementInfo(name)
         # Indicate that the Pokemon wasn't in the database
         if pokemonStats.empty:
             print(f"A Pokemon with the name {name} could not be found.")
@@ -200,14 +779,14 @@ class Pokemon:
         self.baseStats.update(self.pokemon)
         
         # Change the ability to the first available one for the new species.
-        self.abilities = pokemonStats["Abilities"][0]
+        self.abilities = generation.pokemonData.splitAbilities(pokemonStats["Abilities"][0])
         self.changeAbility(0)
         
         # Call to change nature to change the stats to reflect the new specie.
         self.changeNature(self.pokemon['Nature'][0])
         
         # Indicate if there are any specific requirements for the current Pokemon's form.
-        self.formNeeds(self.pokemon['Form'][0])
+        self.formNeeds(self.pokemon['Form'][0], generation)
         
         self.exist = "Success"
 
@@ -215,6 +794,23 @@ class Pokemon:
         self.pokemon.index.names = ['Pokemon']
         return "Success"
 
+    # Updates the Pokemon's stats, types, and abilities to match the current data in the database.
+    # Its nature, item, and moves are kept, as is its ability if the species can still have it.
+    def refresh(self):
+        name = self.pokemon.index[0]
+        generation = self.database.generation
+        pokemonStats = generation.pokemonData.elementInfo(name)
+        if (self.exist == "Fail") or pokemonStats.empty:
+            return "Fail"
+
+        ability = self.pokemon['Ability'][0]
+        self.pokemon.update(pokemonStats)
+        self.baseStats.update(self.pokemon)
+        self.abilities = generation.pokemonData.splitAbilities(pokemonStats["Abilities"][0])
+        self.changeAbility(self.abilities.index(ability) if ability in self.abilities else 0)
+        self.changeNature(self.pokemon['Nature'][0])
+        return "Success"
+
     # Determine if the Pokemon already has the move in its moveset
     def isMoveInMoveset(self, name):
         return ((self.pokemon['Move 1'][0] == name) |
@@ -292,32 +888,26 @@ class Pokemon:
     # This method will take in the form specifier of a Pokemon and perform necessary changes to their held item or attacks to match it.
     # Some Pokemon forms require it to be holding a specific item, abiliity, or move to trigger. The name of the indicated object is held in the "form" cell of a Pokemon's row.
     # This method will be called if the form isn't 0, changeing the required variable to match what it needs to on the Pokemon.
-    def formNeeds(self, name):
+    # The generation of the data the form was read from can be given so that the requirement is looked up in the same generation.
+    def formNeeds(self, name, generation=None):
         # If the form is 0, that means no changes need to be made.
         if name != 0:
-            self.changeItem(name)
-            self.changeMove(name,1)
+            if generation is None:
+                generation = self.database.generation
+            # The form graph indicates whether the requirement is an item or a move, so only the relevant change is attempted.
+            requirementType = generation.formGraph.requirementType(name)
+            if requirementType == "Item":
+                self.changeItem(name)
+            elif requirementType == "Move":
+                self.changeMove(name,1)
         return None
 
     # This method is called to change a Pokemon to its base form if an item or move that maintained its current form has been removed.
     # The name sent is the name of the value that is going to be removed. If this value is equal to the form value, then the Pokemon will be made into its base form.
     def formMaintain(self, name):
         if (name == self.pokemon['Form'][0]):
-            baseForm = self.pokemon.index[0]
-            # Remove the suffix of a Pokemon's name that indicates it is in a different form to find the name of the base form. 
-            if (" - Mega" in baseForm):
-                # Removes all possible mega possiblities. Since nothing will occur if the substring isn't in the name, an if-else statement isn't required.
-                baseForm = baseForm.replace(" - Mega X","")
-                baseForm = baseForm.replace(" - Mega Y","")
-                baseForm = baseForm.replace(" - Mega","")
-            else:
-                baseForm = baseForm.replace(" - Primal","")
-                baseForm = baseForm.replace(" - Origin","")
-                baseForm = baseForm.replace(" - Crowned","")
-                baseForm = baseForm.replace(" - Pirouette","")
-
-            # Change the Pokemon's specie to its base form.
-            self.changeSpecies(baseForm)
+            # Look up the base form of the Pokemon in the database's form graph and change the Pokemon's specie to it.
+            self.changeSpecies(self.database.formGraph.baseForm(self.pokemon.index[0]))
         return None
 
 
@@ -326,7 +916,11 @@ class Pokemon:
 class PokemonTeam:
     def __init__(self, database):
         self.database = database
+        database.trackTeam(self)
         self.team = []
+
+        # Held while the team is being changed so that it isn't refreshed by a reload of the database at the same time.
+        self.lock = threading.RLock()
         
         columns=['Type 1','Type 2','Nature','Health','Attack','Defense','Special Attack',
                  'Special Defense','Speed','Ability','Item','Move 1','Move 2','Move 3','Move 4']
@@ -376,6 +970,14 @@ class PokemonTeam:
             pass
         return None
     
+    # Refreshes every Pokemon in the team against the current data in the database.
+    def refresh(self):
+        with self.lock:
+            for pokemon in self.team:
+                pokemon.refresh()
+            self.updateBasic()
+        return None
+
     # Updates the basic dataset. This is done so that repeated Pokemon can be included in the dataframe without complications.
     def updateBasic(self):
         # Empty the old basic summary information
@@ -419,6 +1021,13 @@ class PokemonTeam:
 
         return True
 
+    # Returns the total and average of each of the team's stats as well as the amount of times each type appears in the team.
+    def teamSummary(self):
+        stats = self.teamBasic[['Health','Attack','Defense','Special Attack','Special Defense','Speed']].astype(float)
+        types = pd.concat([self.teamBasic['Type 1'], self.teamBasic['Type 2']])
+        types = types[types.notna() & (types != "-")].value_counts()
+        return stats.sum(), stats.mean(), types
+
     # Exports the current team to an excel document.
     def teamExport(self, name):
         # Ensure that the name is valid. Ensure that the team isn't empty.
@@ -431,4 +1040,155 @@ class PokemonTeam:
 
         # Export the team to an excel document in the "Saved Teams" folder.
         self.teamBasic.to_excel("Saved Teams/"+name)
+
+        # Add the team to the index of saved teams so it can be found by similarity searches.
+        self.database.teamIndex.addTeam(name, self.teamBasic)
         return True
+
+    # Returns the names of the k saved teams most similar to this team and how similar each is, from 1 (identical) downward.
+    def similarTeams(self, k=5, exclude=None):
+        return self.database.teamIndex.similar(self.teamBasic, k, exclude)
+
+
+# Class to hold every saved team as a fixed length vector so that similar teams can be found without reading every saved team.
+# Each vector marks the team's species, types, moves, and items and holds the team's stat totals.
+# The vectors are stored in a NumPy file in the "Saved Teams" folder and are updated whenever a team is exported.
+# When the index is first used, only saved teams that are new or have changed since the index was last stored are read in.
+class TeamIndex:
+    statColumns = ['Health','Attack','Defense','Special Attack','Special Defense','Speed']
+    moveColumns = ['Move 1','Move 2','Move 3','Move 4']
+
+    # Stat totals are divided by the highest possible total for a team so they are on the same scale as the other features.
+    statScale = 6 * 255
+
+    def __init__(self, pokemonData, moveData, itemData, folder="Saved Teams", fileName="Team Index.npz"):
+        self.folder = folder
+        self.path = os.path.join(folder, fileName)
+        self.lock = threading.Lock()
+        self.loaded = False
+
+        # Every species, type, move, and item is given a position in the vector.
+        data = pokemonData.data
+        types = sorted((set(data['Type 1']) | set(data['Type 2'])) - {"-"})
+        self.positions = {}
+        for section, names in (("Pokemon", data.index), ("Type", types), ("Move", moveData.data.index),
+                               ("Item", itemData.data.index)):
+            for name in names:
+                self.positions.setdefault((section, name), len(self.positions))
+        self.statStart = len(self.positions)
+        self.length = self.statStart + len(self.statColumns)
+
+        # The signature changes if the positions do, in which case the stored vectors can't be reused.
+        self.signature = hashlib.sha1(repr(sorted(self.positions.items(), key=lambda item: item[1])).encode()).hexdigest()
+
+        self.names = []
+        self.modified = np.zeros(0)
+        self.vectors = np.zeros((0, self.length), dtype=np.float32)
+
+    # Converts a team's basic information into a vector of unit length.
+    def encodeTeam(self, teamBasic):
+        vector = np.zeros(self.length, dtype=np.float32)
+        for name, row in zip(teamBasic.index, teamBasic.to_dict(orient='records')):
+            features = [("Pokemon", name), ("Type", row.get('Type 1')), ("Type", row.get('Type 2')), ("Item", row.get('Item'))]
+            features += [("Move", row.get(move)) for move in self.moveColumns]
+            for feature in features:
+                position = self.positions.get(feature)
+                if position is not None:
+                    vector[position] = 1
+        if not teamBasic.empty:
+            stats = teamBasic[self.statColumns].apply(pd.to_numeric, errors='coerce').fillna(0).sum()
+            vector[self.statStart:] = stats.to_numpy(dtype=np.float32) / self.statScale
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    # Reads in the stored index and any saved teams that were added or changed since it was stored.
+    def load(self):
+        if self.loaded:
+            return None
+        if os.path.isfile(self.path):
+            # The file is closed as soon as the arrays are read so that it can be replaced when the index is saved.
+            with np.load(self.path) as stored:
+                if str(stored['signature']) == self.signature:
+                    self.names = stored['names'].tolist()
+                    self.modified = stored['modified']
+                    self.vectors = stored['vectors']
+        self.loaded = True
+
+        # Remove teams that no longer exist and read in the teams that are new or have changed.
+        saved = {}
+        if os.path.isdir(self.folder):
+            saved = {name: os.path.getmtime(os.path.join(self.folder, name))
+                     for name in os.listdir(self.folder) if name[-5:] == ".xlsx"}
+        keep = [i for i, name in enumerate(self.names) if (name in saved) and (self.modified[i] == saved[name])]
+        changed = len(keep) != len(self.names)
+        self.names = [self.names[i] for i in keep]
+        self.modified = self.modified[keep]
+        self.vectors = self.vectors[keep]
+        added = [name for name in saved if name not in self.names]
+        if added:
+            vectors = [self.encodeTeam(pd.read_excel(os.path.join(self.folder, name), index_col=0)) for name in added]
+            self.names = self.names + added
+            self.modified = np.append(self.modified, [saved[name] for name in added])
+            self.vectors = np.vstack([self.vectors] + vectors)
+        if changed or added:
+            self.save()
+        return None
+
+    # Places a team's vector into the index, replacing the old vector if the team was already in it.
+    # New lists and arrays are made rather than changing the old ones, so searches already in progress aren't affected.
+    def insert(self, name, teamBasic):
+        vector = self.encodeTeam(teamBasic)
+        path = os.path.join(self.folder, name)
+        modified = os.path.getmtime(path) if os.path.isfile(path) else 0
+        if name in self.names:
+            i = self.names.index(name)
+            self.vectors = self.vectors.copy()
+            self.modified = self.modified.copy()
+            self.vectors[i] = vector
+            self.modified[i] = modified
+        else:
+            self.names = self.names + [name]
+            self.vectors = np.vstack([self.vectors, vector])
+            self.modified = np.append(self.modified, modified)
+        return None
+
+    # Writes the index to its file. The file is written under a temporary name first so it is never left half written.
+    def save(self):
+        temporary = self.path + ".tmp.npz"
+        np.savez(temporary, names=np.array(self.names, dtype=str), modified=self.modified,
+                 vectors=self.vectors, signature=np.array(self.signature))
+        os.replace(temporary, self.path)
+        return None
+
+    # Adds an exported team to the index and stores the updated index.
+    def addTeam(self, name, teamBasic):
+        with self.lock:
+            self.load()
+            self.insert(name, teamBasic)
+            self.save()
+        return None
+
+    # Returns up to k (name, similarity) pairs of the saved teams most similar to the given team, most similar first.
+    # Similarity is the cosine of the angle between the two teams' vectors.
+    def similar(self, teamBasic, k=5, exclude=None):
+        vector = self.encodeTeam(teamBasic)
+        with self.lock:
+            self.load()
+            names, vectors = self.names, self.vectors
+        scores = vectors @ vector
+
+        # The excluded team (e.g., the team being edited) is given the lowest possible score so it is never picked.
+        if exclude is not None:
+            exclude = exclude if exclude[-5:] == ".xlsx" else exclude + ".xlsx"
+            if exclude in names:
+                scores[names.index(exclude)] = -np.inf
+                k = min(k, len(names) - 1)
+        k = min(k, len(names))
+        if k <= 0:
+            return []
+
+        # Only the best k scores are sorted.
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(names[i], float(scores[i])) for i in best]
@@ -0,0 +1,264 @@
+'''
+The following code scores every team in a pool of Pokemon teams against every other team in the pool.
+Relies on "PokemonDataManager.py" for the move data.
+
+Each team is converted into arrays of its Pokemon's types, stats, and moves. The arrays are placed in shared memory so that
+a pool of worker processes can read them without copying, and each worker scores a block of teams against the whole pool.
+The resulting matrix of scores is written to a compact NumPy file.
+
+The score of team A against team B is how much of team B that team A can knock out minus how much of team A that
+team B can knock out, so it ranges from -1 (B is much stronger) to 1 (A is much stronger), and the score of B against A
+is the negative of the score of A against B.
+'''
+
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool, shared_memory
+import PokemonDataManager as pdm
+
+
+# Every type in order. The last position is used for a missing or unknown type, which takes and deals neutral damage.
+types = ['Normal','Fire','Water','Electric','Grass','Ice','Fighting','Poison','Ground',
+         'Flying','Psychic','Bug','Rock','Ghost','Dragon','Dark','Steel','Fairy']
+typePositions = {name: i for i, name in enumerate(types)}
+noType = len(types)
+
+# The types each attacking type is super effective against, not very effective against, and can't affect.
+typeMatchups = {
+    'Normal':   ([], ['Rock','Steel'], ['Ghost']),
+    'Fire':     (['Grass','Ice','Bug','Steel'], ['Fire','Water','Rock','Dragon'], []),
+    'Water':    (['Fire','Ground','Rock'], ['Water','Grass','Dragon'], []),
+    'Electric': (['Water','Flying'], ['Electric','Grass','Dragon'], ['Ground']),
+    'Grass':    (['Water','Ground','Rock'], ['Fire','Grass','Poison','Flying','Bug','Dragon','Steel'], []),
+    'Ice':      (['Grass','Ground','Flying','Dragon'], ['Fire','Water','Ice','Steel'], []),
+    'Fighting': (['Normal','Ice','Rock','Dark','Steel'], ['Poison','Flying','Psychic','Bug','Fairy'], ['Ghost']),
+    'Poison':   (['Grass','Fairy'], ['Poison','Ground','Rock','Ghost'], ['Steel']),
+    'Ground':   (['Fire','Electric','Poison','Rock','Steel'], ['Grass','Bug'], ['Flying']),
+    'Flying':   (['Grass','Fighting','Bug'], ['Electric','Rock','Steel'], []),
+    'Psychic':  (['Fighting','Poison'], ['Psychic','Steel'], ['Dark']),
+    'Bug':      (['Grass','Psychic','Dark'], ['Fire','Fighting','Poison','Flying','Ghost','Steel','Fairy'], []),
+    'Rock':     (['Fire','Ice','Flying','Bug'], ['Fighting','Ground','Steel'], []),
+    'Ghost':    (['Psychic','Ghost'], ['Dark'], ['Normal']),
+    'Dragon':   (['Dragon'], ['Steel'], ['Fairy']),
+    'Dark':     (['Psychic','Ghost'], ['Fighting','Dark','Fairy'], []),
+    'Steel':    (['Ice','Rock','Fairy'], ['Fire','Water','Electric','Steel'], []),
+    'Fairy':    (['Fighting','Dragon','Dark'], ['Fire','Poison','Steel'], []),
+}
+
+# Builds the chart of the damage multiplier of each attacking type (rows) against each defending type (columns).
+def typeChart():
+    chart = np.ones((noType + 1, noType + 1), dtype=np.float32)
+    for attacker, (superEffective, notVeryEffective, noEffect) in typeMatchups.items():
+        for defender in superEffective:
+            chart[typePositions[attacker], typePositions[defender]] = 2
+        for defender in notVeryEffective:
+            chart[typePositions[attacker], typePositions[defender]] = 0.5
+        for defender in noEffect:
+            chart[typePositions[attacker], typePositions[defender]] = 0
+    return chart
+
+# Returns the position of a type, or the position for no type if it isn't a known type.
+def typePosition(name):
+    return typePositions.get(name, noType)
+
+
+# The order of the stats in the encoded teams.
+statColumns = ['Health','Attack','Defense','Special Attack','Special Defense','Speed']
+moveColumns = ['Move 1','Move 2','Move 3','Move 4']
+health, attack, defense, specialAttack, specialDefense = range(5)
+
+# Damage is estimated for Pokemon at level 50 with the highest individual value (31) and no effort values in every stat.
+level = 50
+individualValue = 31
+
+# Converts the stats of a team as they are saved (base stats, changed by the Pokemon's nature) into stats at level 50,
+# so that they are on the same scale as the damage from the level 50 damage formula.
+def levelStats(stats):
+    scaled = np.floor((2 * stats + individualValue) * level / 100)
+    scaled[..., health] += level + 10
+    scaled[..., health + 1:] += 5
+    return scaled
+
+
+# Class to convert teams into the arrays used to score them against each other.
+class TeamEncoder:
+    def __init__(self, database):
+        # Look up the type, power, and category of every move once. Moves without a power (e.g., status moves) have a power of 0.
+        moves = database.moveData.data
+        power = pd.to_numeric(moves['Power'].astype(object), errors='coerce').fillna(0).to_numpy(dtype=np.float32)
+        self.moves = {name: (typePosition(moveType), movePower, category == "Special")
+                      for name, moveType, movePower, category in zip(moves.index, moves['Type'], power, moves['Category'])}
+
+    # Converts a list of teams' basic information (as in PokemonTeam.teamBasic or a saved team) into arrays.
+    # Teams with fewer than six Pokemon have their remaining slots marked as empty.
+    def encode(self, teams):
+        count = len(teams)
+        arrays = {"types": np.full((count, 6, 2), noType, dtype=np.int8),
+                  "stats": np.zeros((count, 6, len(statColumns)), dtype=np.float32),
+                  "moveTypes": np.full((count, 6, 4), noType, dtype=np.int8),
+                  "movePower": np.zeros((count, 6, 4), dtype=np.float32),
+                  "moveSpecial": np.zeros((count, 6, 4), dtype=bool),
+                  "present": np.zeros((count, 6), dtype=bool)}
+
+        for i, teamBasic in enumerate(teams):
+            rows = teamBasic.iloc[:6]
+            slots = len(rows)
+            arrays["present"][i, :slots] = True
+            arrays["stats"][i, :slots] = levelStats(rows[statColumns].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype=np.float32))
+            for j, row in enumerate(rows.to_dict(orient='records')):
+                arrays["types"][i, j] = [typePosition(row.get('Type 1')), typePosition(row.get('Type 2'))]
+                for k, move in enumerate(moveColumns):
+                    moveType, movePower, special = self.moves.get(row.get(move), (noType, 0, False))
+                    arrays["moveTypes"][i, j, k] = moveType
+                    arrays["movePower"][i, j, k] = movePower
+                    arrays["moveSpecial"][i, j, k] = special
+        return arrays
+
+
+# Returns, for every team in the block against every team in the pool, the share of the defending team that the attacking team can knock out.
+# Each attacking Pokemon's best move against each defending Pokemon is estimated with the level 50 damage formula,
+# using same type attack bonus, type effectiveness, and the physical or special stats that the move uses. The stats are the level 50 stats from TeamEncoder.
+# A defending Pokemon counts as knocked out in proportion to the largest share of its health any attacking Pokemon can deal, up to all of it.
+def blockPressure(chart, block, pool):
+    # Dimensions are (attacking team, defending team, attacking Pokemon, defending Pokemon, move).
+    moveTypes = block["moveTypes"][:, None, :, None, :]
+    defendTypes = pool["types"][None, :, None, :, None, :]
+    effectiveness = chart[moveTypes, defendTypes[..., 0]] * chart[moveTypes, defendTypes[..., 1]]
+
+    attackTypes = block["types"][:, None, :, None, None, :]
+    stab = np.where((attackTypes == moveTypes[..., None]).any(axis=-1) & (moveTypes != noType), np.float32(1.5), np.float32(1))
+
+    attackStats = block["stats"][:, None, :, None, None, :]
+    defendStats = pool["stats"][None, :, None, :, None, :]
+    special = block["moveSpecial"][:, None, :, None, :]
+    ratio = np.where(special,
+                     attackStats[..., specialAttack] / np.maximum(defendStats[..., specialDefense], 1),
+                     attackStats[..., attack] / np.maximum(defendStats[..., defense], 1))
+
+    power = block["movePower"][:, None, :, None, :]
+    damage = np.where(power > 0, (22 * power * ratio / 50 + 2) * stab * effectiveness, np.float32(0))
+
+    # The share of each defending Pokemon's health taken by each attacking Pokemon's best move.
+    share = damage.max(axis=-1) / np.maximum(pool["stats"][None, :, None, :, health], 1)
+    share = np.where(block["present"][:, None, :, None], share, 0)
+    knockedOut = np.minimum(share.max(axis=2), 1)
+
+    # Average over the Pokemon in the defending team.
+    present = pool["present"][None, :, :]
+    return (knockedOut * present).sum(axis=-1) / np.maximum(present.sum(axis=-1), 1)
+
+
+# Shared arrays attached to by each worker process.
+workerArrays = {}
+
+# Attaches a worker process to the shared arrays. The shared memory blocks are kept so they stay open while the worker runs.
+def attachWorker(specs):
+    for name, (memoryName, shape, dtype) in specs.items():
+        memory = shared_memory.SharedMemory(name=memoryName)
+        workerArrays[name] = (memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+    return None
+
+# Scores the teams from start to end against every team and writes the results into the shared pressure matrix.
+def scoreBlock(bounds):
+    start, end = bounds
+    arrays = {name: array for name, (memory, array) in workerArrays.items()}
+    block = {name: arrays[name][start:end] for name in ("types", "stats", "moveTypes", "movePower", "moveSpecial", "present")}
+    arrays["pressure"][start:end] = blockPressure(arrays["chart"], block, arrays)
+    return end - start
+
+
+# Class to score a pool of teams against each other.
+class MatchupEvaluator:
+    def __init__(self, database):
+        self.encoder = TeamEncoder(database)
+        self.chart = typeChart()
+
+    # Returns an N x N matrix where the value at row i and column j is the score of team i against team j.
+    # The teams are split into blocks that are scored by a pool of worker processes sharing the encoded teams.
+    # Blocks are sized so that each holds roughly the same amount of work no matter how many teams there are.
+    def matchupMatrix(self, teams, workers=None, blockElements=4000000):
+        arrays = self.encoder.encode(teams)
+        arrays["chart"] = self.chart
+        count = len(teams)
+        if count == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        blockSize = max(1, blockElements // (count * 6 * 6 * 4))
+        blocks = [(start, min(start + blockSize, count)) for start in range(0, count, blockSize)]
+        workers = min(workers or os.cpu_count() or 1, len(blocks))
+
+        # Score the blocks in this process if only one worker is needed.
+        if workers <= 1:
+            pressure = np.zeros((count, count), dtype=np.float32)
+            for start, end in blocks:
+                block = {name: array[start:end] for name, array in arrays.items() if name != "chart"}
+                pressure[start:end] = blockPressure(self.chart, block, arrays)
+            return pressure - pressure.T
+
+        # Copy each array into shared memory, including the pressure matrix the workers write their results into.
+        arrays["pressure"] = np.zeros((count, count), dtype=np.float32)
+        memories = {}
+        try:
+            specs = {}
+            for name, array in arrays.items():
+                memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                memories[name] = memory
+                np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+                specs[name] = (memory.name, array.shape, array.dtype)
+
+            with Pool(workers, initializer=attachWorker, initargs=(specs,)) as pool:
+                pool.map(scoreBlock, blocks)
+
+            memoryName, shape, dtype = specs["pressure"]
+            pressure = np.ndarray(shape, dtype=dtype, buffer=memories["pressure"].buf).copy()
+        finally:
+            for memory in memories.values():
+                memory.close()
+                memory.unlink()
+        return pressure - pressure.T
+
+
+# Writes a matrix of scores and the names of the teams to a NumPy file. Scores are stored as 16 bit floats to keep the file small.
+def saveMatrix(path, names, matrix):
+    np.savez(path, names=np.array(names, dtype=str), scores=matrix.astype(np.float16))
+    return None
+
+# Reads a matrix of scores and the names of the teams written by saveMatrix.
+def loadMatrix(path):
+    with np.load(path) as stored:
+        return stored['names'].tolist(), stored['scores'].astype(np.float32)
+
+# Reads in a saved team's basic information.
+def readTeam(path):
+    return pd.read_excel(path, index_col=0)
+
+# Reads in every saved team in the folder, using a pool of worker processes. Returns the names of the teams and their basic information.
+def loadSavedTeams(folder="Saved Teams", workers=None):
+    names = sorted(name for name in os.listdir(folder) if name[-5:] == ".xlsx")
+    paths = [os.path.join(folder, name) for name in names]
+    if (workers or os.cpu_count() or 1) <= 1 or len(paths) <= 1:
+        return names, [readTeam(path) for path in paths]
+    with Pool(workers) as pool:
+        return names, pool.map(readTeam, paths, chunksize=16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scores every saved Pokemon team against every other saved team.")
+    parser.add_argument("--folder", default="Saved Teams")
+    parser.add_argument("--output", default="Matchups.npz")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    pdb = pdm.PokemonDatabase('Pokemon Data.xlsx')
+    names, teams = loadSavedTeams(args.folder, args.workers)
+    start = time.time()
+    matrix = MatchupEvaluator(pdb).matchupMatrix(teams, args.workers)
+    saveMatrix(args.output, names, matrix)
+    print(f"Scored {len(names)} teams in {time.time() - start:.1f} seconds and saved the scores to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
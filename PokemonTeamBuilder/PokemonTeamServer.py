@@ -0,0 +1,373 @@
+'''
+The following code runs a local HTTP server that lets several users build and edit Pokemon teams at the same time.
+Relies on "PokemonDataManager.py" for data management.
+
+The database is read in once and shared by every session. Each session holds its own team and its own filters,
+so searching or editing in one session never affects another. Requests and responses are sent as JSON.
+
+Endpoints (<id> is the session id returned when a session is created):
+    POST   /sessions                            Create a new session.
+    DELETE /sessions/<id>                       End a session.
+    GET    /sessions/<id>/search/<table>        Current filtered list of "pokemon", "moves", or "items".
+    POST   /sessions/<id>/search/<table>        Apply filters: {"filters": {"Name": ..., "Type": ...}, "reset": bool, "sort": column}
+    GET    /sessions/<id>/team                  Current team.
+    POST   /sessions/<id>/team/<action>         Edit the team. Actions are add, remove, species, swap, move, ability, item, and nature.
+    POST   /sessions/<id>/team/import           Import a team from the "Saved Teams" folder: {"name": ...}
+    POST   /sessions/<id>/team/export           Export the team to the "Saved Teams" folder: {"name": ...}
+    GET    /sessions/<id>/analysis              Stat totals, stat averages, and type counts of the team.
+    GET    /sessions/<id>/similar               Saved teams most similar to the team. Parameters are k and exclude.
+    GET    /query/<table>                       Search "pokemon", "moves", or "items" without a session or filter state.
+                                                Parameters are name, type, ability, category, sort, offset, and limit.
+    POST   /query/<table>                       Search with a predicate of ranges and lists: {"where": [...], "sort": column}
+                                                Predicates are written as described in QueryEngine.where. Takes offset and limit parameters.
+    GET    /query                               Hits and misses of the search caches.
+'''
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit, unquote, parse_qsl
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import PokemonDataManager as pdm
+
+
+# Converts numpy values inside of responses into values that can be written as JSON.
+def jsonDefault(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+# Converts a dataframe into a list of rows, with the name of each element included in its row.
+def dataRecords(df, offset=0, limit=None):
+    df = df.iloc[offset:] if limit is None else df.iloc[offset:offset + limit]
+    return df.reset_index().to_dict(orient='records')
+
+# Checks that the name of a team to import or export is a single file name, so that only the "Saved Teams" folder can be read or written.
+def savedTeamName(name):
+    if not isinstance(name, str):
+        raise ValueError("The name of the team must be text.")
+    if (os.path.basename(name) != name) or ("/" in name) or ("\\" in name) or (name in ("", ".", "..")):
+        raise ValueError(f"{name} isn't a valid team name.")
+    return name
+
+
+# Class to hold the team and filters for a single user of the server.
+class Session:
+    def __init__(self, database):
+        self.database = database
+        self.team = pdm.PokemonTeam(database)
+        self.resetTables()
+
+        # Requests for the same session are handled one at a time so the team isn't edited by two requests at once.
+        # The team's lock is used so that the team also isn't edited while it is being refreshed by a reload of the database.
+        self.lock = self.team.lock
+        self.lastUsed = time.monotonic()
+
+    # Each session filters its own view of the shared data.
+    # The views are made again if the database has been reloaded since they were made.
+    def resetTables(self):
+        generation = self.database.generation
+        self.version = generation.version
+        self.tables = {"pokemon": generation.pokemonData.filterSession(),
+                       "moves": generation.moveData.filterSession(),
+                       "items": generation.itemData.filterSession()}
+        return None
+
+    # Applies the requested filters to one of the session's tables and returns the filtered data.
+    # Every filter is checked before any are applied, since an invalid filter would be kept by the table and break every later search.
+    def search(self, table, filters, reset=False, sort=None):
+        data = self.tables[table]
+        if not isinstance(filters, dict):
+            raise ValueError("The filters must be a JSON object.")
+        for filter_name, filter_value in filters.items():
+            if not data.isFilterName(filter_name):
+                raise ValueError(f"The {table} table can't be filtered by {filter_name}.")
+            if (filter_value is not None) and (not isinstance(filter_value, str)):
+                raise ValueError(f"The value of the {filter_name} filter must be text.")
+        if reset:
+            data.filterReset()
+        for filter_name, filter_value in filters.items():
+            data.quickFilter(filter_name, filter_value)
+        # Only the Pokemon data can be sorted.
+        if sort and isinstance(data, pdm.PokemonData):
+            data.sortData(sort)
+        return data.filtered
+
+    # Performs the requested change to the team. Returns "Success" or "Fail" like the team and Pokemon methods.
+    def editTeam(self, action, body):
+        team = self.team
+        if action == "add":
+            return "Fail" if team.addPokemon(body.get("name")) == "Fail" else "Success"
+        if action == "remove":
+            team.removePokemon(int(body.get("position", -1)))
+            return "Success"
+        if action == "species":
+            team.changeSpecies(body.get("name"), int(body.get("position", -1)))
+            return "Success"
+        if action == "swap":
+            team.swapPokemon(int(body.get("a", -1)), int(body.get("b", -1)))
+            return "Success"
+
+        # The remaining actions change a single Pokemon in the team, so the position must be in range.
+        position = int(body.get("position", -1))
+        if (position < 0) or (position >= len(team.team)):
+            return "Fail"
+        pokemon = team.team[position]
+        if action == "move":
+            result = pokemon.changeMove(body.get("name"), int(body.get("slot", 1)))
+        elif action == "ability":
+            result = pokemon.changeAbility(int(body.get("index", 0)))
+        elif action == "item":
+            result = pokemon.changeItem(body.get("name"))
+        elif action == "nature":
+            result = pokemon.changeNature(body.get("name"))
+        else:
+            return "Fail"
+        team.updateBasic()
+        return result
+
+    # Returns the rows of the team. The team's dataframe doesn't name its index, so it is named here.
+    def teamRecords(self):
+        return dataRecords(self.team.teamBasic.rename_axis("Pokemon"))
+
+    # Returns the stat totals, stat averages, and type counts of the team.
+    def analysis(self):
+        totals, averages, types = self.team.teamSummary()
+        return {"totals": totals.to_dict(), "averages": averages.fillna(0).to_dict(), "types": types.to_dict()}
+
+
+# Class for the server. It holds the shared database and every active session.
+# Requests are handled by a fixed pool of worker threads rather than a new thread for every request.
+# A connection keeps its worker until it is closed or has been idle for longer than the request handler's timeout.
+class PokemonTeamServer(HTTPServer):
+    def __init__(self, address, database, workers=16, sessionTimeout=3600):
+        super().__init__(address, PokemonRequestHandler)
+        self.database = database
+        self.sessions = {}
+        self.sessionLock = threading.Lock()
+        self.sessionTimeout = sessionTimeout
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    # Hands each connection to the worker pool.
+    def process_request(self, request, client_address):
+        self.pool.submit(self.processRequestWorker, request, client_address)
+
+    def processRequestWorker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+    # Creates a new session and returns its id. Sessions that haven't been used for a while are removed first.
+    def createSession(self):
+        now = time.monotonic()
+        with self.sessionLock:
+            for sessionId in [k for k, v in self.sessions.items() if now - v.lastUsed > self.sessionTimeout]:
+                del self.sessions[sessionId]
+            sessionId = uuid.uuid4().hex
+            self.sessions[sessionId] = Session(self.database)
+        return sessionId
+
+    # Returns the requested session, or None if it doesn't exist.
+    def getSession(self, sessionId):
+        with self.sessionLock:
+            session = self.sessions.get(sessionId)
+        if session is not None:
+            session.lastUsed = time.monotonic()
+        return session
+
+    def endSession(self, sessionId):
+        with self.sessionLock:
+            return self.sessions.pop(sessionId, None) is not None
+
+
+# Class to handle each request sent to the server.
+class PokemonRequestHandler(BaseHTTPRequestHandler):
+    # Connections are kept open between requests to avoid reconnecting for every request.
+    # Each open connection holds a worker, so connections that are idle for longer than the timeout (in seconds) are closed
+    # to free the worker for other clients.
+    protocol_version = "HTTP/1.1"
+    timeout = 5
+
+    # Requests are not logged to keep the console clear.
+    def log_message(self, format, *args):
+        return None
+
+    # Sends a response with the given status and JSON body.
+    def sendJson(self, status, body):
+        data = json.dumps(body, default=jsonDefault).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # Reads the JSON body of the request. An empty body is treated as an empty object.
+    def readJson(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length == 0:
+            return {}
+        body = json.loads(self.rfile.read(length))
+        if not isinstance(body, dict):
+            raise ValueError("The request body must be a JSON object.")
+        return body
+
+    # Splits the path into its parts and the query parameters.
+    def splitPath(self):
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.split("/") if part]
+        return parts, dict(parse_qsl(url.query))
+
+    def do_GET(self):
+        self.handleRequest("GET")
+
+    def do_POST(self):
+        self.handleRequest("POST")
+
+    def do_DELETE(self):
+        self.handleRequest("DELETE")
+
+    # Sends the request to the session it belongs to.
+    def handleRequest(self, method):
+        try:
+            parts, params = self.splitPath()
+            body = self.readJson() if method == "POST" else {}
+        except ValueError as error:
+            self.sendJson(400, {"error": str(error)})
+            return
+
+        # Searches that don't need a session are answered from the database's query cache.
+        if parts and (parts[0] == "query") and (method != "DELETE"):
+            self.sendJson(*self.runRequest(self.queryRequest, method, parts[1:], params, body))
+            return
+
+        if (not parts) or (parts[0] != "sessions"):
+            self.sendJson(404, {"error": "Unknown path."})
+            return
+
+        # Create a new session.
+        if len(parts) == 1:
+            if method == "POST":
+                self.sendJson(200, {"session": self.server.createSession()})
+            else:
+                self.sendJson(405, {"error": "Sessions can only be created with POST."})
+            return
+
+        # End a session.
+        if (len(parts) == 2) and (method == "DELETE"):
+            if self.server.endSession(parts[1]):
+                self.sendJson(200, {"result": "Success"})
+            else:
+                self.sendJson(404, {"error": "Unknown session."})
+            return
+
+        session = self.server.getSession(parts[1])
+        if session is None:
+            self.sendJson(404, {"error": "Unknown session."})
+            return
+
+        with session.lock:
+            status, response = self.runRequest(self.sessionRequest, session, method, parts[2:], params, body)
+        self.sendJson(status, response)
+
+    # Calls the function handling a request and returns the status and the response body.
+    # Invalid requests are answered with a 400 and any other error with a 500, so the client always receives a response.
+    def runRequest(self, function, *args):
+        try:
+            return function(*args)
+        except (ValueError, TypeError, KeyError) as error:
+            return 400, {"error": str(error)}
+        except Exception as error:
+            return 500, {"error": f"{type(error).__name__}: {error}"}
+
+    # Performs a search without a session and returns the status and the response body.
+    # The query engine is read once so the rows found and the data they are looked up in come from the same generation of the data.
+    def queryRequest(self, method, parts, params, body):
+        engine = self.server.database.queryEngine
+        if (not parts) and (method == "GET"):
+            return 200, engine.cacheInfo()
+        if len(parts) != 1:
+            return 404, {"error": "Unknown path."}
+
+        offset = int(params.get("offset", 0))
+        limit = int(params["limit"]) if "limit" in params else None
+        if method == "POST":
+            rows = engine.where(parts[0], body.get("where", ["and"]), body.get("sort"))
+        else:
+            rows = engine.query(parts[0], params.get("name"), params.get("type"), params.get("ability"),
+                                params.get("category"), params.get("sort"))
+        # Only the requested page of rows is looked up in the data.
+        page = rows[offset:] if limit is None else rows[offset:offset + limit]
+        return 200, {"count": len(rows), "results": dataRecords(engine.rowData(parts[0], page))}
+
+    # Performs the request for a session and returns the status and the response body.
+    def sessionRequest(self, session, method, parts, params, body):
+        if session.version != session.database.version:
+            session.resetTables()
+        offset = int(params.get("offset", 0))
+        limit = int(params["limit"]) if "limit" in params else None
+
+        if (len(parts) == 2) and (parts[0] == "search"):
+            if parts[1] not in session.tables:
+                return 404, {"error": "Unknown table."}
+            if method == "POST":
+                filtered = session.search(parts[1], body.get("filters", {}), body.get("reset", False), body.get("sort"))
+            else:
+                filtered = session.tables[parts[1]].filtered
+            return 200, {"count": len(filtered), "results": dataRecords(filtered, offset, limit)}
+
+        if (len(parts) == 1) and (parts[0] == "team") and (method == "GET"):
+            return 200, {"team": session.teamRecords()}
+
+        if (len(parts) == 2) and (parts[0] == "team") and (method == "POST"):
+            if parts[1] == "import":
+                result = session.team.teamImport(savedTeamName(body.get("name")))
+                session.team.updateBasic()
+            elif parts[1] == "export":
+                result = session.team.teamExport(savedTeamName(body.get("name")))
+            else:
+                result = session.editTeam(parts[1], body) == "Success"
+            return 200, {"result": "Success" if result else "Fail", "team": session.teamRecords()}
+
+        if (len(parts) == 1) and (parts[0] == "analysis") and (method == "GET"):
+            return 200, session.analysis()
+
+        if (len(parts) == 1) and (parts[0] == "similar") and (method == "GET"):
+            similar = session.team.similarTeams(int(params.get("k", 5)), params.get("exclude"))
+            return 200, {"teams": [{"name": name, "similarity": similarity} for name, similarity in similar]}
+
+        return 404, {"error": "Unknown path."}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs a local JSON server for building Pokemon teams.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    pdb = pdm.PokemonDatabase('Pokemon Data.xlsx')
+    # Reload the data in the background whenever the excel document is updated.
+    pdb.watch()
+    server = PokemonTeamServer((args.host, args.port), pdb, args.workers)
+    print(f"Serving Pokemon Team Builder on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()